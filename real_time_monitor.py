@@ -15,13 +15,17 @@ max  |
      Y
 Sensor data is being plotted w.r.t time
 
-We use MQTT IoT protocol to send data over internet using JSON. (To be replaced with Google Protocol buffers to make it
-language neutral )
+We use MQTT IoT protocol to send data over internet using Google Protocol buffers (see sensor_data.proto) to keep the
+payload small and language neutral. Bindings are generated with: protoc --python_out=. sensor_data.proto
 
-This module has 3 classes
+This module has 4 classes
+SharedPlotData: This class keeps latest samples in shared memory for plotting
 PlotSensorData: This class uses shared variables to plot data with respect to time
 PlotPosition : This class localizes object within the environment
 RunMqtt: This class runs MQTT client continuously to fetch data
+and functions
+run_plots: shows both plots from one process
+classify_positions: numba compiled position classification used by RunMqtt.decide_pos
 
 Why Multiprocessing?
 Aim was to plot data in real time. To do this we need two things to happen together, fetch data from MQTT server and
@@ -36,230 +40,255 @@ Thus we moved to multiprocessing by sharing(passing) data structures to each pro
 
 What processes are running?
 1. Fetch data from MQTT server
-2. Plot data in real time
-3. Plot Position
+2. Plot data and position in real time (both figures share one matplotlib event loop)
 
 * NOTE 
 MQTT is a client sever protocol. We have two clients talking to the public MQTT broker (iot.eclipse.org) on the same topic. 
 Raspberry Pi being first is collecting data from all sensors and publishing, this program being second client is fetching data
-from server.
+from server. Samples are published in batches (SensorBatch) so that per-message overhead is paid once per batch.
 
 """
 
 import paho.mqtt.client as mqtt
-import json
+from sensor_data_pb2 import SensorBatch
 import time
 from matplotlib import animation
-from matplotlib.pylab import *
-import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+import matplotlib.pyplot as plt
 import multiprocessing
-import datetime
+from multiprocessing import shared_memory
+from queue import Empty, Full
+import numpy as np
+import numba
 import csv
+import logging
+import math
+
+logger = logging.getLogger(__name__)
 
 mqttHost = "iot.eclipse.org"
 
 data_class = "one_dpps"
 
-allData = {}
-xpiReceived = 0
-ypiReceived = 0
-plot_list = []
-
 y_keys = ["x7", "x6", "x5", "x4", "x3", "x2", "x1", "x0"]
 x_keys = ["y1", "y2", "y3", "y4", "y5", "y6", "y7", "y8", "y9"]
 
 csv_columns = ['timestamp', 'x0', 'x1', 'x2', 'x3', 'x4', 'x5', 'x6', 'x7', 'x8', 'y0', 'y1', 'y2', 'y3', 'y4', 'y5',
                'y6', 'y7', 'y8', 'y9', 'microwave0', 'microwave1', 'PIR0', 'PIR1', 'PIR2', 'PIR3', 'pz0', 'pz1', 'pz2',
                'pz3']
+sensor_columns = csv_columns[1:]
 x_pos = []
 y_pos = []
 
-write_header = True
+do_not_convert = frozenset(("timestamp", "origin"))     # SensorSample fields that are not sensor values
+
+csv_flush_rows = 100                    # flush buffered CSV rows to disk every this many rows
+csv_flush_seconds = 1.0                 # or when this many seconds passed since last flush
+
+
+@numba.njit(cache=True)
+def classify_positions(a, b):
+    """This function is the compiled part of RunMqtt.decide_pos
+
+    Arguments
+    ---------
+    a : float64 array of output of the senors mounted along y axis
+    b : float64 array of output of the senors mounted along x axis
+
+    Returns
+    -------
+    out : array of shape (4, len(a)), rows are green x, green y, red x and red y co-ordinates
+    n_green : number of valid columns in green rows
+    n_red : number of valid columns in red rows
+
+    """
+    out = np.empty((4, len(a)), dtype=np.float64)
+    n_green = 0
+    n_red = 0
+    # first sensor is never used, and after a hit the next sensor is skipped
+    ignore = 0
+    for i in range(len(a)):
+        if ignore == i:
+            continue
+        # negative or -inf readings are invalid, and would make b lookups below fall outside b (numba does not
+        # check bounds)
+        if 0 <= a[i] < 250:
+            y = (250 / 9) * (i + 1)
+            x_point = int(a[i] / 28)
+            if b[x_point - 1] < 180 or b[x_point - 2] < 180:
+                out[2, n_red] = a[i]
+                out[3, n_red] = y
+                n_red += 1
+            else:
+                out[0, n_green] = a[i]
+                out[1, n_green] = y
+                n_green += 1
+            ignore = i + 1
+    return out, n_green, n_red
+
+
+class SharedPlotData(object):
+    """This class holds the five latest samples in one shared memory block so that plotting process reads them
+    without going through a manager process
+
+    Arguments
+    ---------
+    window: number of latest samples kept for plotting
+
+    Attributes
+    ----------
+    timestamps: array of shape (window,) with "%H:%M:%S" timestamps as bytes
+    x_data: array of shape (window, 9), column k holds sensor x_keys[k] (for sensors mounted on x axis)
+    y_data: array of shape (window, 8), column m holds sensor y_keys[m] (for sensors mounted on y axis)
+    write_index: number of windows written so far, 0 means nothing to plot yet
+
+    Methods
+    -------
+    write: copy a new window into shared memory
+    read: copy latest window out of shared memory
+    close: detach this process from shared memory
+    unlink: free shared memory, called once by the process that created it
+
+    """
+    def __init__(self, window=5):
+        self.window = window
+        self.shm = shared_memory.SharedMemory(create=True, size=self._size(window))
+        self.write_index = multiprocessing.Value('I', 0)
+        self._make_views()
+
+    @staticmethod
+    def _size(window):
+        return window * 8 + window * len(x_keys) * 4 + window * len(y_keys) * 4
+
+    def _make_views(self):
+        n = self.window
+        ts_end = n * 8
+        x_end = ts_end + n * len(x_keys) * 4
+        self.timestamps = np.ndarray((n,), dtype="S8", buffer=self.shm.buf[:ts_end])
+        self.x_data = np.ndarray((n, len(x_keys)), dtype=np.float32, buffer=self.shm.buf[ts_end:x_end])
+        self.y_data = np.ndarray((n, len(y_keys)), dtype=np.float32, buffer=self.shm.buf[x_end:])
+
+    def __getstate__(self):
+        # numpy views can not be pickled, child processes rebuild them on the same block
+        return self.window, self.shm, self.write_index
+
+    def __setstate__(self, state):
+        self.window, self.shm, self.write_index = state
+        self._make_views()
+
+    def write(self, timestamps, x_rows, y_rows):
+        """This method copies one window of samples into shared memory
+
+        Arguments
+        ---------
+        timestamps: list of "%H:%M:%S" strings, oldest first
+        x_rows: list of rows with values of sensors in x_keys order
+        y_rows: list of rows with values of sensors in y_keys order
+
+        """
+        with self.write_index.get_lock():
+            self.timestamps[:] = [ts.encode() for ts in timestamps]
+            self.x_data[:] = x_rows
+            self.y_data[:] = y_rows
+            self.write_index.value += 1
+
+    def read(self):
+        """This method copies latest window out of shared memory under the same lock as write, so that timestamps and
+        values always come from one window
+
+        Returns
+        -------
+        write_index, timestamps, x_data, y_data (copies)
+
+        """
+        with self.write_index.get_lock():
+            return self.write_index.value, self.timestamps.copy(), self.x_data.copy(), self.y_data.copy()
+
+    def close(self):
+        """This method drops the array views and detaches from shared memory"""
+        del self.timestamps, self.x_data, self.y_data
+        self.shm.close()
+
+    def unlink(self):
+        """This method frees shared memory block"""
+        self.shm.unlink()
 
 
 class PlotSensorData(object):
     """This class plot sensor data in real time
+
+    All 17 sensors share one axes. Each sensor gets its own horizontal lane (0 - 300 scaled to lane height) and all
+    lanes are drawn by a single LineCollection, so a frame is one artist instead of 17 axes.
+    X axis is the position of a sample in the window (oldest to newest), so axis limits never change and the
+    animation can blit. Time range of the window is shown as text inside the axes.
     Arguments
     ----------
-    timestamp_list: a list with five latest timestamps
-    x_sensor_data_dict: dictionary with sensor identifier as key and list of five latest values of that sensor as
-                       value. (for sensors mounted on x axis)
-    y_sensor_data_dict: dictionary with sensor identifier as key and list of five latest values of that sensor as
-                       value. (for sensors mounted on y axis)
+    plot_data: SharedPlotData with five latest timestamps and sensor values
 
     Methods
     -------
     update: update plot
-    run_data_plotter: run matplotlib animation forever
+    start_animation: create matplotlib animation, shown by run_plots
 
      """
-    def __init__(self, timestamp_list, x_sensor_data_dict, y_sensor_data_dict):
-        self.timestamp_list = timestamp_list
-        self.x_sensor_data_dict = x_sensor_data_dict
-        self.y_sensor_data_dict = y_sensor_data_dict
+    sensor_max = 300
+
+    # lane labels from top to bottom, x axis sensors (y1 - y9) first, then y axis sensors (x7 - x0)
+    lane_labels = ["x1", "x2", "x3", "x4", "x5", "x6", "x7", "x8", "x9",
+                   "y1", "y2", "y3", "y4", "y5", "y6", "y7", "y8"]
 
-        self.fig = figure()
+    def __init__(self, plot_data):
+        self.plot_data = plot_data
+        n_lanes = len(self.lane_labels)
+        self.lane_offsets = np.arange(n_lanes - 1, -1, -1, dtype=np.float64)
+
+        self.fig = plt.figure()
         self.fig.suptitle("Real Time Monitoring (Early Beta)", fontsize=12)
-        plt.gcf().autofmt_xdate()
-
-        # X axis goes here
-        self.ax01 = subplot2grid((5, 4), (0, 0))
-        self.ax01.set_ylim(0, 300)
-        self.ax01.tick_params(axis='x', labelsize=6)
-
-        self.ax02 = subplot2grid((5, 4), (0, 1))
-        self.ax02.set_ylim(0, 300)
-        self.ax02.tick_params(axis='x', labelsize=6)
-
-        self.ax03 = subplot2grid((5, 4), (1, 0))
-        self.ax03.set_ylim(0, 300)
-        self.ax03.tick_params(axis='x', labelsize=6)
-
-        self.ax04 = subplot2grid((5, 4), (1, 1))
-        self.ax04.set_ylim(0, 300)
-        self.ax04.tick_params(axis='x', labelsize=6)
-
-        self.ax05 = subplot2grid((5, 4), (2, 0))
-        self.ax05.set_ylim(0, 300)
-        self.ax05.tick_params(axis='x', labelsize=6)
-
-        self.ax06 = subplot2grid((5, 4), (2, 1))
-        self.ax06.set_ylim(0, 300)
-        self.ax06.tick_params(axis='x', labelsize=6)
-
-        self.ax07 = subplot2grid((5, 4), (3, 0))
-        self.ax07.set_ylim(0, 300)
-        self.ax07.tick_params(axis='x', labelsize=6)
-
-        self.ax08 = subplot2grid((5, 4), (3, 1))
-        self.ax08.set_ylim(0, 300)
-        self.ax08.tick_params(axis='x', labelsize=6)
-
-        self.ax09 = subplot2grid((5, 4), (4, 0))
-        self.ax09.set_ylim(0, 300)
-        self.ax09.tick_params(axis='x', labelsize=6)
-
-        # Y axis goes here
-        self.ax10 = subplot2grid((5, 4), (0, 2))
-        self.ax10.set_ylim(0, 300)
-        self.ax10.tick_params(axis='x', labelsize=6)
-
-        self.ax11 = subplot2grid((5, 4), (0, 3))
-        self.ax11.set_ylim(0, 300)
-        self.ax11.tick_params(axis='x', labelsize=6)
-
-        self.ax12 = subplot2grid((5, 4), (1, 2))
-        self.ax12.set_ylim(0, 300)
-        self.ax12.tick_params(axis='x', labelsize=6)
-
-        self.ax13 = subplot2grid((5, 4), (1, 3))
-        self.ax13.set_ylim(0, 300)
-        self.ax13.tick_params(axis='x', labelsize=6)
-
-        self.ax14 = subplot2grid((5, 4), (2, 2))
-        self.ax14.set_ylim(0, 300)
-        self.ax14.tick_params(axis='x', labelsize=6)
-
-        self.ax15 = subplot2grid((5, 4), (2, 3))
-        self.ax15.set_ylim(0, 300)
-        self.ax15.tick_params(axis='x', labelsize=6)
-
-        self.ax16 = subplot2grid((5, 4), (3, 2))
-        self.ax16.set_ylim(0, 300)
-        self.ax16.tick_params(axis='x', labelsize=6)
-
-        self.ax17 = subplot2grid((5, 4), (3, 3))
-        self.ax17.set_ylim(0, 300)
-        self.ax17.tick_params(axis='x', labelsize=6)
-
-        # Plotting object for x axis
-        self.p011, = self.ax01.plot(x_pos, y_pos, 'b-', label="x1", marker="o")
-        self.p012, = self.ax02.plot(x_pos, y_pos, 'b-', label="x2", marker="o")
-        self.p021, = self.ax03.plot(x_pos, y_pos, 'b-', label="x3", marker="o")
-        self.p022, = self.ax04.plot(x_pos, y_pos, 'b-', label="x4", marker="o")
-        self.p031, = self.ax05.plot(x_pos, y_pos, 'b-', label="x5", marker="o")
-        self.p032, = self.ax06.plot(x_pos, y_pos, 'b-', label="x6", marker="o")
-        self.p041, = self.ax07.plot(x_pos, y_pos, 'b-', label="x7", marker="o")
-        self.p042, = self.ax08.plot(x_pos, y_pos, 'b-', label="x8", marker="o")
-        self.p051, = self.ax09.plot(x_pos, y_pos, 'b-', label="x9", marker="o")
-        # Plotting object for y axis
-        self.p013, = self.ax10.plot(x_pos, y_pos, 'r-', label="y1", marker="o")
-        self.p014, = self.ax11.plot(x_pos, y_pos, 'r-', label="y2", marker="o")
-        self.p023, = self.ax12.plot(x_pos, y_pos, 'r-', label="y3", marker="o")
-        self.p024, = self.ax13.plot(x_pos, y_pos, 'r-', label="y4", marker="o")
-        self.p033, = self.ax14.plot(x_pos, y_pos, 'r-', label="y5", marker="o")
-        self.p034, = self.ax15.plot(x_pos, y_pos, 'r-', label="y6", marker="o")
-        self.p043, = self.ax16.plot(x_pos, y_pos, 'r-', label="y7", marker="o")
-        self.p044, = self.ax17.plot(x_pos, y_pos, 'r-', label="y8", marker="o")
+
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.ax.set_ylim(0, n_lanes)
+        self.ax.set_yticks(self.lane_offsets + 0.5)
+        self.ax.set_yticklabels(self.lane_labels, fontsize=6)
+        self.ax.set_yticks(np.arange(n_lanes + 1), minor=True)
+        self.ax.grid(True, axis='y', which='minor')
+        window = self.plot_data.window
+        self.x_axis = np.arange(window, dtype=np.float64)
+        self.ax.set_xlim(0, window - 1)
+        self.ax.set_xticks(self.x_axis)
+        self.ax.set_xticklabels([str(k - window + 1) for k in range(window - 1)] + ["latest"], fontsize=6)
+        self.ax.set_xlabel("sample", fontsize=6)
+        self.time_text = self.ax.text(0.01, 0.99, "", transform=self.ax.transAxes, fontsize=6, va='top')
+
+        self.lines = LineCollection([], colors=['b'] * len(x_keys) + ['r'] * len(y_keys), antialiaseds=False,
+                                    capstyle='butt')
+        self.ax.add_collection(self.lines)
+        self.segments = np.empty((n_lanes, window, 2), dtype=np.float32)
+        self.segments[:, :, 0] = self.x_axis
+        self.drawn_index = 0
+
+        # legend does not change, so it is built only once
+        self.ax.legend(handles=[Line2D([], [], color='b', label="x axis sensors"),
+                                Line2D([], [], color='r', label="y axis sensors")], loc='upper right')
 
     def update(self, i):
-        time.sleep(1)
-        x_axis = [datetime.datetime.strptime(date, "%H:%M:%S") for date in self.timestamp_list]
-
-        # Set data for x axis
-        self.p011.set_data(x_axis, self.x_sensor_data_dict["y1"])
-        self.p012.set_data(x_axis, self.x_sensor_data_dict["y2"])
-        self.p021.set_data(x_axis, self.x_sensor_data_dict["y3"])
-        self.p022.set_data(x_axis, self.x_sensor_data_dict["y4"])
-        self.p031.set_data(x_axis, self.x_sensor_data_dict["y5"])
-        self.p032.set_data(x_axis, self.x_sensor_data_dict["y6"])
-        self.p041.set_data(x_axis, self.x_sensor_data_dict["y7"])
-        self.p042.set_data(x_axis, self.x_sensor_data_dict["y8"])
-        self.p051.set_data(x_axis, self.x_sensor_data_dict["y9"])
-
-        self.p011.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p011.axes.legend(loc='upper right')
-        self.p012.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p012.axes.legend(loc='upper right')
-        self.p021.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p021.axes.legend(loc='upper right')
-        self.p022.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p022.axes.legend(loc='upper right')
-        self.p031.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p031.axes.legend(loc='upper right')
-        self.p032.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p032.axes.legend(loc='upper right')
-        self.p041.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p041.axes.legend(loc='upper right')
-        self.p042.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p042.axes.legend(loc='upper right')
-        self.p051.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p051.axes.legend(loc='upper right')
-
-        # Set data for y axis
-        self.p013.set_data(x_axis, self.y_sensor_data_dict["x7"])
-        self.p014.set_data(x_axis, self.y_sensor_data_dict["x6"])
-        self.p023.set_data(x_axis, self.y_sensor_data_dict["x5"])
-        self.p024.set_data(x_axis, self.y_sensor_data_dict["x4"])
-        self.p033.set_data(x_axis, self.y_sensor_data_dict["x3"])
-        self.p034.set_data(x_axis, self.y_sensor_data_dict["x2"])
-        self.p043.set_data(x_axis, self.y_sensor_data_dict["x1"])
-        self.p044.set_data(x_axis, self.y_sensor_data_dict["x0"])
-
-        self.p013.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p013.axes.legend(loc='upper right')
-        self.p014.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p014.axes.legend(loc='upper right')
-        self.p023.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p023.axes.legend(loc='upper right')
-        self.p024.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p024.axes.legend(loc='upper right')
-        self.p033.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p033.axes.legend(loc='upper right')
-        self.p034.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p034.axes.legend(loc='upper right')
-        self.p043.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p043.axes.legend(loc='upper right')
-        self.p044.axes.set_xlim(x_axis[0], x_axis[-1])
-        self.p044.axes.legend(loc='upper right')
-
-        return self.p011, self.p012, self.p021, self.p022, self.p031, self.p032, self.p041, self.p042, \
-               self.p051, self.p013, self.p014, self.p023, self.p024, self.p033, self.p034, \
-               self.p043, self.p044,
-
-    def run_data_plotter(self):
-        anim = animation.FuncAnimation(self.fig, self.update, frames=200, interval=20)
-        plt.show()
+        # frames run faster than data arrives, only rebuild segments and time text for a new window
+        if self.plot_data.write_index.value == self.drawn_index:
+            return self.lines, self.time_text,
+        self.drawn_index, timestamps, x_data, y_data = self.plot_data.read()
+
+        # clip to 0 - 300 like the old per-sensor ylim, otherwise a reading would draw into a neighbouring lane
+        values = np.clip(np.hstack((x_data, y_data)) / self.sensor_max, 0, 1)
+        self.segments[:, :, 1] = values.T + self.lane_offsets[:, None]
+        self.lines.set_segments(self.segments)
+
+        self.time_text.set_text(timestamps[0].decode() + " - " + timestamps[-1].decode())
+
+        return self.lines, self.time_text,
+
+    def start_animation(self):
+        return animation.FuncAnimation(self.fig, self.update, frames=200, interval=20, blit=True,
+                                       cache_frame_data=False)
 
 
 class PlotPosition(object):
@@ -267,41 +296,70 @@ class PlotPosition(object):
 
     Arguments
     ---------
-    list_x : x axis points to plot(this is a python list)
-    list_y : y axis points to plot (this is python list)
+    position_queue : multiprocessing queue of (green_x, green_y, red_x, red_y) tuples to plot
 
-    Both the variables are calculated by decide_pos method from RunMqtt class
+    Positions are calculated by decide_pos method from RunMqtt class
 
     Methods
     --------
     animate: set data in real time
-    run_plot : matplotlib animation function running forever
+    start_animation : create matplotlib animation, shown by run_plots
 
     """
-    def __init__(self, list_x, list_y):
-        self.list_x = list_x  # considered x
-        self.list_y = list_y
+    def __init__(self, position_queue):
+        self.position_queue = position_queue
+        self.position = None                # latest position received, kept until a newer one arrives
         self.fig = plt.figure()
         self.fig.suptitle("Object Localization(Early Beta)", fontsize=12)
         self.ax = plt.axes(xlim=(0, 300), ylim=(0, 250))
-        self.g, = self.ax.plot(x_pos, y_pos, "go")
-        self.r, = self.ax.plot(x_pos, y_pos, "ro")
+        self.g, = self.ax.plot(x_pos, y_pos, "go", antialiased=False)
+        self.r, = self.ax.plot(x_pos, y_pos, "ro", antialiased=False)
         self.ax.xaxis.tick_top()
         self.ax.set_xlabel("X axis")
         self.ax.set_ylabel("Y axis")
         plt.grid(True)
         plt.gca().invert_yaxis()
 
-    def animate(self,i):
-        time.sleep(1)
-
-        self.g.set_data(self.list_x[0], self.list_y[0])
-        self.r.set_data(self.list_x[1], self.list_y[1])
+    def animate(self, i):
+        # drain queue so that only the newest position is drawn
+        position = self.position
+        try:
+            while True:
+                position = self.position_queue.get_nowait()
+        except Empty:
+            pass
+        if position is self.position:
+            return self.g, self.r,
+        self.position = position
+
+        green_x, green_y, red_x, red_y = position
+        self.g.set_data(green_x, green_y)
+        self.r.set_data(red_x, red_y)
         return self.g, self.r,
 
-    def run_plot(self):
-        anim = animation.FuncAnimation(self.fig, self.animate, frames=200, interval=20)
-        plt.show()
+    def start_animation(self):
+        return animation.FuncAnimation(self.fig, self.animate, frames=200, interval=20, blit=True,
+                                       cache_frame_data=False)
+
+
+def run_plots(position_queue, plot_data, data_ready):
+    """This function runs both plots in one process with a single matplotlib event loop, it is the GUI process of
+    this application
+
+    Arguments
+    ---------
+    position_queue: queue with positions for PlotPosition
+    plot_data: SharedPlotData for PlotSensorData
+    data_ready: event set by RunMqtt once first window is available
+
+    """
+    data_ready.wait()
+    # figures are created here so that they belong to GUI process
+    plot_position = PlotPosition(position_queue=position_queue)
+    plot_sensor_data = PlotSensorData(plot_data=plot_data)
+    # animations must stay referenced until plt.show returns, otherwise they are garbage collected
+    anims = [plot_position.start_animation(), plot_sensor_data.start_animation()]
+    plt.show()
 
 
 class RunMqtt(object):
@@ -310,29 +368,48 @@ class RunMqtt(object):
 
      Arguments
      ---------
-     list_x : a common list shared by two processes. recmsg method from this class adds new values to the list
-              and PlotPosition class use it to localize objects within environment.
-     list_y : this is same as list_x, list_x handles x parameters and list_y handles y parameters
-     timestamp_list: list shared by two processes containing timestamps
-     x_sensor_data_dict: dictionary shared by two processes representing output of sensors mounted on x axis
-     y_sensor_data_dict: dictionary shared by two processes representing output of sensors mounted on y axis
+     position_queue : a queue shared by two processes. recmsg method from this class puts new positions on it
+                      and PlotPosition class use it to localize objects within environment.
+     data_ready : event set once the first full plotting window has been written, GUI process waits on it
+     plot_data: SharedPlotData shared by two processes with timestamps and output of sensors mounted on x and y axis
 
      Methods
      ---------
      subscribe : subscribe to the channel on public broker
      decide_pos : decides the position of an object within environment
+     open_csv: open CSV file once and write the header
      write_to_csv: write results to CSV file
-     recmsg: receive message from Raspberry pi and decode it
+     merge_sample: merge one XPi/YPi sample into the current row
+     recmsg: receive a batch of samples from Raspberry pi and decode it
      mqttDisconnect: raise an error when connection to broker is broken
      run_mqtt : set up client and get data forever
 
      """
-    def __init__(self, list_x, list_y, timestamp_list, x_sensor_data_dict, y_sensor_data_dict):
-        self.list_x = list_x
-        self.list_y = list_y
-        self.timestamp_list = timestamp_list
-        self.x_sensor_data_dict = x_sensor_data_dict
-        self.y_sensor_data_dict = y_sensor_data_dict
+    def __init__(self, position_queue, plot_data, data_ready):
+        self.position_queue = position_queue
+        self.plot_data = plot_data
+        self.data_ready = data_ready
+
+        # row being assembled from XPi and YPi halves, with a fixed set of keys. Values are reset from empty_row at
+        # start of every XPi cycle, NaN marks a sensor that was not sent and is saved as a blank cell
+        self.empty_row = {name: np.nan for name in sensor_columns}
+        self.empty_row["timestamp"] = ""
+        self.all_data = dict(self.empty_row)
+        self.xpi_received = False
+
+        # ring buffer with latest rows for plotting, slot ring_idx % window is overwritten by next row
+        self.ring = np.zeros((plot_data.window, len(sensor_columns)), dtype=np.float64)
+        self.ring_timestamps = [""] * plot_data.window
+        self.ring_idx = 0
+        # ring columns of x_keys and y_keys, computed once so reads are a single fancy index
+        col_index = {name: i for i, name in enumerate(sensor_columns)}
+        self.x_cols = np.array([col_index[x] for x in x_keys])
+        self.y_cols = np.array([col_index[y] for y in y_keys])
+
+        self.csv_file = None
+        self.csv_writer = None
+        self.csv_rows = 0
+        self.csv_flushed_at = 0.0
 
     def subscribe(self, client, data, mid, rc):
         """This method subscribes to the topic on which Raspberry Pi is publishing data data"""
@@ -350,34 +427,21 @@ class RunMqtt(object):
 
          Returns
          --------
+         numpy arrays
          plot_green_x : x co-ordinate array of person sitting
          plot_green_y : y co-ordinate array of person sitting
          plot_red_x : x co-ordinate array of person standing
          plot_red_y: y co-ordinate array of person standing
 
          """
-        plot_green_x = []
-        plot_green_y = []
-        plot_red_x = []
-        plot_red_y = []
-        ignore = 0
-        for i in range(len(a)):
-            if ignore == i:
-                continue
-            else:
-                if a[i] < 250:
-                    y = ((250 / 9) * (i + 1))
-                    x = a[i]
-                    x_point = int(a[i] / 28)
-                    before = x_point - 1
-                    if b[x_point - 1] < 180 or b[before - 1] < 180:
-                        plot_red_x.append(x)
-                        plot_red_y.append(y)
-                    else:
-                        plot_green_x.append(x)
-                        plot_green_y.append(y)
-                    ignore = i + 1
-        return plot_green_x, plot_green_y, plot_red_x, plot_red_y
+        out, n_green, n_red = classify_positions(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+        return out[0, :n_green], out[1, :n_green], out[2, :n_red], out[3, :n_red]
+
+    def open_csv(self):
+        """This method opens CSV file for the lifetime of MQTT process and writes the header once"""
+        self.csv_file = open("./" + data_class + ".csv", "a", newline="", buffering=1 << 16)
+        self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=csv_columns)
+        self.csv_writer.writeheader()
 
     def write_to_csv(self, dict_data):
         """This method writes sensor data to CSV file
@@ -387,105 +451,104 @@ class RunMqtt(object):
         dict_data: dictionary with keys as column name
 
         """
-        global write_header
-        f = open("./"+data_class+".csv", "a", newline="")
-        writer = csv.DictWriter(f, fieldnames=csv_columns)
-        if write_header:
-            writer.writeheader()
-        writer.writerow(dict_data)
-        write_header = False
-
-    def recmsg(self, client, data, msg):
-        """This method decodes received data and update shared lists and dictionary"""
-
-        global allData
-        global xpiReceived
-        global ypiReceived
-        global x_keys
-        global y_keys
-        global x_p
-        global y_p
-
-        jobject = msg.payload.decode()
-        rmsg = json.loads(jobject)
-        do_not_convert = ["timestamp", "origin", "piezoString"]
-
-        if rmsg['origin'] == "XPi":
-            xpiReceived = 1
+        # values are kept at full precision, two decimals are only applied to what is saved
+        row = {name: "" if math.isnan(value) else "%.2f" % value
+               for name, value in dict_data.items() if name != "timestamp"}
+        row["timestamp"] = dict_data["timestamp"]
+        self.csv_writer.writerow(row)
+        self.csv_rows += 1
+        now = time.monotonic()
+        if self.csv_rows % csv_flush_rows == 0 or now - self.csv_flushed_at >= csv_flush_seconds:
+            self.csv_file.flush()
+            self.csv_flushed_at = now
+
+    def merge_sample(self, rmsg):
+        """This method merges one decoded sample into all_data and, once a YPi sample completes a row, stores that row
 
-            if xpiReceived == 1 and ypiReceived == 0:
-                allData.clear()
-
-            pz_list = rmsg["piezoString"].split(",")
-            allData["pz0"] = float(pz_list[0])
-            allData["pz1"] = float(pz_list[1])
-            allData["pz2"] = float(pz_list[2])
-            allData["pz3"] = float(pz_list[3])
-
-            allData.update(dict((k, round(float(v), 2)) for k, v in rmsg.items() if k not in do_not_convert))
-            allData["timestamp"] = rmsg["timestamp"]
-
-            allData.pop("piezoString", None)
-
-            xpiReceived = 0
-
-        elif rmsg["origin"] == "YPi":
-            ypiReceived = 1
-            if ypiReceived == 1:
-                rmsg.pop("timestampy", None)
-                allData.update(dict((k, round(float(v), 2)) for k, v in rmsg.items() if k not in do_not_convert))
-
-            ypiReceived = 0
-
-            if len(allData) > 14:
-                self.write_to_csv(allData)
-
-            if len(plot_list) < 5:
-                plot_list.append(allData.copy())
-                if len(plot_list[0]) < 15:
-                    plot_list.pop(0)
-            else:
-                plot_list.pop(0)
-                plot_list.append(allData.copy())
-
-            df = pd.DataFrame(plot_list)
-
-            if not df.empty:
+        Arguments
+        ---------
+        rmsg: SensorSample received from XPi or YPi
 
-                print(plot_list[-1])
+        Returns
+        -------
+        True if a row was completed by this sample
 
-                x_new = [df.iloc[-1][x] for x in x_keys]
-                y_new = [df.iloc[-1][y] for y in y_keys]
+        """
+        if rmsg.origin == "XPi":
+            # keys of all_data are preallocated, so values are reset in place instead of clearing the dict
+            self.all_data.update(self.empty_row)
+            # ListFields only returns the sensors this Pi actually sent
+            self.all_data.update({f.name: v for f, v in rmsg.ListFields() if f.name not in do_not_convert})
+            self.all_data["timestamp"] = rmsg.timestamp
+            self.xpi_received = True
 
-                ts = df.iloc[-1]["timestamp"]
+        elif rmsg.origin == "YPi":
+            self.all_data.update({f.name: v for f, v in rmsg.ListFields() if f.name not in do_not_convert})
 
-                green_x, green_y, red_x, red_y = self.decide_pos(y_new, x_new)
-                if len(self.list_x) < 1:
-                    self.list_x.append(green_x)
-                    self.list_x.append(red_x)
-                    self.list_y.append(green_y)
-                    self.list_y.append(red_y)
+            # rows missing XPi half are neither saved nor plotted
+            if self.xpi_received:
+                self.write_to_csv(self.all_data)
 
-                else:
-                    self.list_x[0] = green_x
-                    self.list_x[1] = red_x
-                    self.list_y[0] = green_y
-                    self.list_y[1] = red_y
+                slot = self.ring_idx % self.plot_data.window
+                self.ring[slot] = [self.all_data[name] for name in sensor_columns]
+                self.ring_timestamps[slot] = self.all_data["timestamp"].split()[1]
+                self.ring_idx += 1
+                return True
 
-                if len(self.timestamp_list) < 5:
-                    self.timestamp_list.append(ts.split()[1])
-                else:
-                    self.timestamp_list.pop(0)
-                    self.timestamp_list.append(ts.split()[1])
+        return False
 
-                if len(df.index) == 5:
-                    for k in range(9):
-                        self.x_sensor_data_dict[x_keys[k]] = df.iloc[-5:][x_keys[k]].tolist()
-                    for m in range(8):
-                        self.y_sensor_data_dict[y_keys[m]] = df.iloc[-5:][y_keys[m]].tolist()
+    def recmsg(self, client, data, msg):
+        """This method decodes a received batch of samples, puts latest position on position_queue and writes plotting
+        window to plot_data, once per batch"""
+
+        batch = SensorBatch()
+        batch.ParseFromString(msg.payload)
+
+        row_completed = False
+        for rmsg in batch.samples:
+            row_completed = self.merge_sample(rmsg) or row_completed
+
+        if row_completed:
+            window = self.plot_data.window
+            last_slot = (self.ring_idx - 1) % window
+            last = self.ring[last_slot]
+
+            # building the row dict is the expensive part, so skip it unless debug output is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("sample: %s", dict(zip(sensor_columns, last.tolist()),
+                                                timestamp=self.ring_timestamps[last_slot]))
+
+            x_new = last[self.x_cols]
+            y_new = last[self.y_cols]
+
+            # never block MQTT loop, when plotter falls behind (e.g. while it starts up) drop the oldest position so
+            # that the newest one is always drawn
+            position = self.decide_pos(y_new, x_new)
+            try:
+                self.position_queue.put_nowait(position)
+            except Full:
+                try:
+                    self.position_queue.get_nowait()
+                except Empty:
+                    pass                    # plotter emptied the queue or is in the middle of reading from it
+                try:
+                    self.position_queue.put_nowait(position)
+                except Full:
+                    pass                    # plotter still holds its slot, raising here would stop MQTT loop
+
+            # A batch can complete several rows, so publish the whole plotting window at once
+            if self.ring_idx >= window:
+                order = (np.arange(window) + self.ring_idx) % window     # oldest slot first
+                rows = self.ring[order]
+                self.plot_data.write([self.ring_timestamps[k] for k in order],
+                                     rows[:, self.x_cols], rows[:, self.y_cols])
+                if not self.data_ready.is_set():
+                    self.data_ready.set()
 
     def mqttDisconn(self, client, data, rc):
         """This method checks for network connectivity with MQTT broker"""
+        # this method never returns, so save buffered rows before looping
+        self.csv_file.flush()
         while True:
             print("disconnect from MQTT triggered. Entering infinite loop. "
                   "Write self-restarting code here if this ever triggers in testing!")
@@ -494,44 +557,49 @@ class RunMqtt(object):
 
     def run_mqtt(self):
         """This method creates client to connect with broker and is separate process in this application """
+        # File is opened here, not in __init__, so that it belongs to MQTT process
+        self.open_csv()
         client = mqtt.Client()
         client.on_connect = self.subscribe
         client.on_message = self.recmsg
         print("Attempting to connect to MQTT broker")
         client.connect(mqttHost, 1883, 60)
         client.on_disconnect = self.mqttDisconn
-        client.loop_forever()
+        try:
+            client.loop_forever()
+        finally:
+            self.csv_file.close()
 
 
 if __name__ == "__main__":
-    """Since processes does not have a common memory space like threads, python multiprocessing manager is being used
-    to manage shared resources among three processes.
+    """Since processes does not have a common memory space like threads, sensor data for plotting is kept in a shared
+    memory block (SharedPlotData) and positions are streamed to the position plotter through a bounded queue.
     
     """
-    mgr = multiprocessing.Manager()
-    list_x_pos = mgr.list()                      # empty list
-    list_y_pos = mgr.list()
-    timestamp = mgr.list()
-    x_sensor_data_dict = mgr.dict()              # empty dictionary
-    y_sensor_data_dict = mgr.dict()
-
-    # create objects of all three classes
-    plot_object = PlotPosition(list_x=list_x_pos, list_y=list_y_pos)
-    mqtt_object = RunMqtt(list_x=list_x_pos, list_y=list_y_pos, timestamp_list=timestamp,
-                          x_sensor_data_dict=x_sensor_data_dict, y_sensor_data_dict=y_sensor_data_dict)
-    plot_data_object = PlotSensorData(timestamp_list=timestamp, x_sensor_data_dict=x_sensor_data_dict,
-                                      y_sensor_data_dict=y_sensor_data_dict)
-
-    # three processes are created with corresponding target functions from three different classes
+    logging.basicConfig(level=logging.INFO)
+
+    # fork children start from parent memory instead of re-importing matplotlib, numpy and paho (default on Linux
+    # only, spawn is used where fork is not available)
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork", force=True)
+
+    position_queue = multiprocessing.Queue(maxsize=4)
+    plot_data = SharedPlotData(window=5)
+    data_ready = multiprocessing.Event()
+
+    mqtt_object = RunMqtt(position_queue=position_queue, plot_data=plot_data, data_ready=data_ready)
+
+    # two processes are created, one fetching data over MQTT and one GUI process showing both plots
     p_1 = multiprocessing.Process(target=mqtt_object.run_mqtt)
-    p_2 = multiprocessing.Process(target=plot_object.run_plot)
-    p_3 = multiprocessing.Process(target=plot_data_object.run_data_plotter)
+    p_2 = multiprocessing.Process(target=run_plots, args=(position_queue, plot_data, data_ready))
 
+    # GUI process starts right away and blocks on data_ready until enough data points arrived to plot
     p_1.start()
-    time.sleep(20)                         # Wait for enough data points to arrive to plot
     p_2.start()
-    time.sleep(6)
-    p_3.start()
     p_1.join()                            # Join all processes so that main program does not exit until all are executed
+    if not data_ready.is_set():
+        # MQTT process exited (e.g. broker unreachable) before first window, GUI process would wait forever
+        p_2.terminate()
     p_2.join()
-    p_3.join()
+    plot_data.close()
+    plot_data.unlink()
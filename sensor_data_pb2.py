@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: sensor_data.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11sensor_data.proto\x12\x03wsn\"\xa1\x06\n\x0cSensorSample\x12\x0e\n\x06origin\x18\x01 \x01(\t\x12\x11\n\ttimestamp\x18\x02 \x01(\t\x12\x0f\n\x02x0\x18\x03 \x01(\x02H\x00\x88\x01\x01\x12\x0f\n\x02x1\x18\x04 \x01(\x02H\x01\x88\x01\x01\x12\x0f\n\x02x2\x18\x05 \x01(\x02H\x02\x88\x01\x01\x12\x0f\n\x02x3\x18\x06 \x01(\x02H\x03\x88\x01\x01\x12\x0f\n\x02x4\x18\x07 \x01(\x02H\x04\x88\x01\x01\x12\x0f\n\x02x5\x18\x08 \x01(\x02H\x05\x88\x01\x01\x12\x0f\n\x02x6\x18\t \x01(\x02H\x06\x88\x01\x01\x12\x0f\n\x02x7\x18\n \x01(\x02H\x07\x88\x01\x01\x12\x0f\n\x02x8\x18\x0b \x01(\x02H\x08\x88\x01\x01\x12\x0f\n\x02y0\x18\x0c \x01(\x02H\t\x88\x01\x01\x12\x0f\n\x02y1\x18\r \x01(\x02H\n\x88\x01\x01\x12\x0f\n\x02y2\x18\x0e \x01(\x02H\x0b\x88\x01\x01\x12\x0f\n\x02y3\x18\x0f \x01(\x02H\x0c\x88\x01\x01\x12\x0f\n\x02y4\x18\x10 \x01(\x02H\r\x88\x01\x01\x12\x0f\n\x02y5\x18\x11 \x01(\x02H\x0e\x88\x01\x01\x12\x0f\n\x02y6\x18\x12 \x01(\x02H\x0f\x88\x01\x01\x12\x0f\n\x02y7\x18\x13 \x01(\x02H\x10\x88\x01\x01\x12\x0f\n\x02y8\x18\x14 \x01(\x02H\x11\x88\x01\x01\x12\x0f\n\x02y9\x18\x15 \x01(\x02H\x12\x88\x01\x01\x12\x17\n\nmicrowave0\x18\x16 \x01(\x02H\x13\x88\x01\x01\x12\x17\n\nmicrowave1\x18\x17 \x01(\x02H\x14\x88\x01\x01\x12\x11\n\x04PIR0\x18\x18 \x01(\x02H\x15\x88\x01\x01\x12\x11\n\x04PIR1\x18\x19 \x01(\x02H\x16\x88\x01\x01\x12\x11\n\x04PIR2\x18\x1a \x01(\x02H\x17\x88\x01\x01\x12\x11\n\x04PIR3\x18\x1b \x01(\x02H\x18\x88\x01\x01\x12\x10\n\x03pz0\x18\x1c \x01(\x02H\x19\x88\x01\x01\x12\x10\n\x03pz1\x18\x1d \x01(\x02H\x1a\x88\x01\x01\x12\x10\n\x03pz2\x18\x1e \x01(\x02H\x1b\x88\x01\x01\x12\x10\n\x03pz3\x18\x1f \x01(\x02H\x1c\x88\x01\x01\x42\x05\n\x03_x0B\x05\n\x03_x1B\x05\n\x03_x2B\x05\n\x03_x3B\x05\n\x03_x4B\x05\n\x03_x5B\x05\n\x03_x6B\x05\n\x03_x7B\x05\n\x03_x8B\x05\n\x03_y0B\x05\n\x03_y1B\x05\n\x03_y2B\x05\n\x03_y3B\x05\n\x03_y4B\x05\n\x03_y5B\x05\n\x03_y6B\x05\n\x03_y7B\x05\n\x03_y8B\x05\n\x03_y9B\r\n\x0b_microwave0B\r\n\x0b_microwave1B\x07\n\x05_PIR0B\x07\n\x05_PIR1B\x07\n\x05_PIR2B\x07\n\x05_PIR3B\x06\n\x04_pz0B\x06\n\x04_pz1B\x06\n\x04_pz2B\x06\n\x04_pz3\"1\n\x0bSensorBatch\x12\"\n\x07samples\x18\x01 \x03(\x0b\x32\x11.wsn.SensorSampleb\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'sensor_data_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _SENSORSAMPLE._serialized_start=27
+  _SENSORSAMPLE._serialized_end=828
+  _SENSORBATCH._serialized_start=830
+  _SENSORBATCH._serialized_end=879
+# @@protoc_insertion_point(module_scope)